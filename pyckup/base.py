@@ -1,26 +1,45 @@
 """
 Base
 """
+
 from contextlib import suppress
+from functools import lru_cache
+import mmap
 import re
 import os
 from dol.misc import get_obj
 from dol import Files
 
 ignore_if_module_not_found = suppress(ModuleNotFoundError, ImportError)
+# Kept for backward compat; grab now splits on '://' directly (no regex).
 protocol_sep_p = re.compile(r'(\w+)://(.+)')
 
 dflt_protocols = dict()
 
 
-def get_local_file_bytes_or_folder_mapping(key):
-    """Get byte contents given a filepath"""
+DFLT_MMAP_THRESHOLD = 1 << 20  # 1 MiB
+
+
+def get_local_file_bytes_or_folder_mapping(key, as_mmap=False):
+    """Get byte contents given a filepath.
+
+    With ``as_mmap=True``, files bigger than ``DFLT_MMAP_THRESHOLD`` are
+    returned as a read-only ``mmap.mmap`` instead of ``bytes``: a zero-copy,
+    bytes-like view backed by the page cache, which slices and feeds into
+    ``numpy.frombuffer``, ``bytes(...)``, etc., without ever copying the whole
+    file into memory. Unlike ``bytes``, it's your job to ``.close()`` it when
+    you're done.
+    """
     if key.startswith('file://'):
         key = key[len('file://') :]
     if os.path.isdir(key):
         return Files(key)
     else:
         with open(key, 'rb') as fp:
+            if as_mmap and os.path.getsize(key) > DFLT_MMAP_THRESHOLD:
+                # The mapping keeps its own reference to the file, so closing
+                # fp here is fine.
+                return mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
             # In case you're wondering if this closes fp:
             # https://stackoverflow.com/a/9885287/5758423
             return fp.read()
@@ -28,25 +47,78 @@ def get_local_file_bytes_or_folder_mapping(key):
 
 dflt_protocols['file'] = get_local_file_bytes_or_folder_mapping
 
+
+def _grab(key, protocols=None):
+    """The (uncached) engine of ``grab``: dispatch ``key`` on its protocol."""
+    if callable(protocols):
+        protocols = protocols()
+
+    protocol, sep, _ = key.partition('://')
+    if not sep:
+        if key[:1] in ('/', '\\'):
+            # A bare local path; with default protocols, skip dispatch entirely
+            # (this is the hottest, cheapest-to-fetch case).
+            if not protocols:
+                return get_local_file_bytes_or_folder_mapping(key)
+            key = 'file://' + key
+            protocol = 'file'
+        else:
+            return get_obj(key)
+
+    protocols = protocols or dflt_protocols
+    protocol_func = protocols.get(protocol, None)
+    if protocol_func is None:
+        raise KeyError(f'Unrecognized protocol: {protocol}')
+    return protocol_func(key)
+
+
+_grab_with_dflt_protocols = lru_cache(maxsize=4096)(_grab)
+
+
+def _lazy_protocol(name, factory):
+    """Defer building a protocol's fetcher to its first use.
+
+    Constructors like ``Graze()`` and ``KaggleDatasets()`` touch the filesystem
+    (config dirs, credentials...), which shouldn't be paid by every
+    ``import pyckup`` -- most of which only ever grab local files. The factory
+    runs on the first grab of the protocol; the fetcher it builds then replaces
+    this closure in ``dflt_protocols``, so subsequent grabs pay nothing extra.
+    """
+
+    def fetch(key):
+        protocol_func = factory()
+        dflt_protocols[name] = protocol_func
+        return protocol_func(key)
+
+    return fetch
+
+
 with ignore_if_module_not_found:
     from haggle import KaggleDatasets
 
-    kaggle_data = KaggleDatasets()
+    @lru_cache(maxsize=None)
+    def _kaggle_fetcher():
+        kaggle_data = KaggleDatasets()
+
+        def get_kaggle_data(key):
+            """Get the zip object of a kaggle dataset (downloaded if not cached locally)"""
+            if key.startswith('kaggle://'):
+                key = key[len('kaggle://') :]
+            return kaggle_data[key]
 
-    def get_kaggle_data(key):
-        """Get the zip object of a kaggle dataset (downloaded if not cached locally)"""
-        if key.startswith('kaggle://'):
-            key = key[len('kaggle://') :]
-        return kaggle_data[key]
+        return get_kaggle_data
 
-    dflt_protocols['kaggle'] = get_kaggle_data
+    dflt_protocols['kaggle'] = _lazy_protocol('kaggle', _kaggle_fetcher)
 
 with ignore_if_module_not_found:
     from graze import Graze
 
-    graze = Graze().__getitem__
-    dflt_protocols['http'] = graze
-    dflt_protocols['https'] = graze
+    @lru_cache(maxsize=None)
+    def _graze_fetcher():
+        return Graze().__getitem__
+
+    dflt_protocols['http'] = _lazy_protocol('http', _graze_fetcher)
+    dflt_protocols['https'] = _lazy_protocol('https', _graze_fetcher)
 
 
 def grab(key, protocols=None):
@@ -122,44 +194,50 @@ def grab(key, protocols=None):
         'FOO://A_FAKE_URL'
 
     """
-    if callable(protocols):
-        protocols = protocols()
-    protocols = protocols or dflt_protocols
-
-    if key.startswith('/') or key.startswith('\\'):
-        key = 'file://' + key
-    if '://' in key:
-        m = protocol_sep_p.match(key)
-        if m:
-            protocol, ref = m.groups()
-            protocol_func = protocols.get(protocol, None)
-            if protocol_func is None:
-                raise KeyError(f'Unrecognized protocol: {protocol}')
-            else:
-                return protocol_func(key)
-
-    return get_obj(key)
+    if protocols is None:
+        # Repeated grabs of the same key are a dict lookup away (safe, since the
+        # underlying fetchers cache and hand out immutable bytes or mappings).
+        return _grab_with_dflt_protocols(key)
+    return _grab(key, protocols)
 
 
-grab.dflt_protocols = list(dflt_protocols)
+grab.dflt_protocols = dflt_protocols.keys()  # live view; no stale list snapshot
+grab.cache_clear = _grab_with_dflt_protocols.cache_clear
 
+import shutil
 import urllib
 
 DFLT_USER_AGENT = 'Wget/1.16 (linux-gnu)'
+DFLT_CHK_SIZE = 1 << 17  # 128 KiB; small chunks make syscall overhead dominate
 
 
-def url_2_bytes(url, chk_size=1024, user_agent=DFLT_USER_AGENT):
-    """get url content bytes"""
+def _url_response(url, user_agent=DFLT_USER_AGENT):
+    req = urllib.request.Request(url)
+    req.add_header('user-agent', user_agent)
+    return urllib.request.urlopen(req)
+
 
-    def content_gen():
-        req = urllib.request.Request(url)
-        req.add_header('user-agent', user_agent)
-        with urllib.request.urlopen(req) as response:
-            while True:
-                chk = response.read(chk_size)
-                if len(chk) > 0:
-                    yield chk
-                else:
-                    break
-
-    return b''.join(content_gen())
+def url_2_bytes(url, chk_size=DFLT_CHK_SIZE, user_agent=DFLT_USER_AGENT):
+    """get url content bytes"""
+    with _url_response(url, user_agent) as response:
+        content_length = response.headers.get('Content-Length')
+        if content_length is not None:
+            # We know the size, so read straight into a pre-sized buffer
+            # (no chunk list to join, no doubled peak memory).
+            buf = bytearray(int(content_length))
+            mv = memoryview(buf)
+            off = 0
+            while n := response.readinto(mv[off : off + chk_size]):
+                off += n
+            # Only pay the extra slice copy when the server under-delivered
+            return bytes(buf) if off == len(buf) else bytes(buf[:off])
+        else:
+            return b''.join(iter(lambda: response.read(chk_size), b''))
+
+
+def url_2_file(url, filepath, chk_size=DFLT_CHK_SIZE, user_agent=DFLT_USER_AGENT):
+    """Download url contents directly to a file, without ever holding the whole
+    body in memory."""
+    with _url_response(url, user_agent) as response, open(filepath, 'wb') as fp:
+        shutil.copyfileobj(response, fp, length=chk_size)
+    return filepath
@@ -0,0 +1,3 @@
+"""
+Data sources: modules that know how to acquire data from specific providers.
+"""
@@ -0,0 +1,298 @@
+"""
+Acquire datasets from OWID (Our World in Data: https://ourworldindata.org).
+
+An OWID dataset is identified by its grapher "slug" -- the last part of a
+``https://ourworldindata.org/grapher/...`` url. ``acquire_owid_data`` downloads
+the dataset's csv and its metadata json to a local downloads folder
+(only hitting the network if the files aren't already there, or if you ask for
+a ``refresh``) and gives you the two local filepaths.
+
+The csv and json downloads are independent round-trips to the same server, so
+they're issued concurrently (``aiohttp`` + ``asyncio.gather``) rather than
+one after the other. If you need many slugs, use ``acquire_many_owid``, which
+fans out over all of them with ``asyncio.gather`` (downloads are capped by a
+shared semaphore so we don't hammer the server).
+
+Needs ``aiohttp`` (``pip install aiohttp``) to actually download anything --
+like ``haggle`` for the kaggle protocol, it's optional, not a pyckup
+dependency, so the module imports fine without it.
+"""
+
+import asyncio
+import json
+import os
+import shutil
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+from pyckup.base import ignore_if_module_not_found
+
+aiohttp = None
+with ignore_if_module_not_found:
+    import aiohttp
+
+owid_url_template = 'https://ourworldindata.org/grapher/{slug}.{ext}'
+owid_downloads_dir_path = os.path.join(os.path.expanduser('~'), '.pyckup', 'owid')
+
+DFLT_CHK_SIZE = 1 << 17  # 128 KiB: enough to amortize syscall overhead
+
+_kind_to_ext = {'csv': 'csv', 'json': 'metadata.json', 'zip': 'zip'}
+
+_max_concurrent_downloads = 8
+
+
+class OwidPaths(NamedTuple):
+    """Where a slug's data landed locally: ``.json`` is the metadata filepath,
+    ``.csv`` the data. Both are ``None`` when the slug isn't served at all.
+    Still a tuple, so ``json_path, csv_path = acquire_owid_data(slug)`` works
+    as it always did."""
+
+    json: Optional[Path]
+    csv: Optional[Path]
+
+
+@lru_cache(maxsize=16384)
+def slug_to_url_and_filename(slug, kind='csv'):
+    """The url to download ``kind`` ('csv', 'json', or 'zip') of a slug's data from,
+    and the local filepath (a ``Path``) to download it to. Pure, so cached --
+    which also means the ``Path`` is constructed once per slug, not once per use."""
+    ext = _kind_to_ext[kind]
+    url = owid_url_template.format(slug=slug, ext=ext)
+    filepath = Path(owid_downloads_dir_path) / f'{slug}.{ext}'
+    return url, filepath
+
+
+_dir_entries = None  # lazy {name: os.DirEntry} snapshot of the downloads dir
+
+
+def _downloads_dir_entries(refresh=False):
+    """One scandir of the downloads dir instead of a stat syscall per probe.
+    Invalidated (via ``_forget_dir_entries``) whenever we write new files."""
+    global _dir_entries
+    if _dir_entries is None or refresh:
+        if os.path.isdir(owid_downloads_dir_path):
+            _dir_entries = {e.name: e for e in os.scandir(owid_downloads_dir_path)}
+        else:
+            _dir_entries = {}
+    return _dir_entries
+
+
+def _forget_dir_entries():
+    global _dir_entries
+    _dir_entries = None
+
+
+def _is_downloaded(filename, entries):
+    entry = entries.get(filename)
+    return entry is not None and entry.stat().st_size > 0
+
+
+# Some slugs are simply not served (403: typically non-redistributable
+# datasets; 404: no such download). Remembering them on disk saves a TLS
+# round-trip per slug per process restart during bulk acquisition. Only these
+# statuses are remembered -- transient trouble (429, 5xx...) raises instead.
+_not_served_statuses = (403, 404)
+_forbidden_ttl_seconds = 7 * 24 * 3600  # re-ask the server after a week
+_forbidden = None  # lazy {slug: {'status': ..., 'ts': ...}}
+_forbidden_lock = threading.Lock()
+
+
+def _forbidden_cache_path():
+    return Path(owid_downloads_dir_path) / '.forbidden.json'
+
+
+def _forbidden_slugs():
+    global _forbidden
+    if _forbidden is None:
+        try:
+            _forbidden = json.loads(_forbidden_cache_path().read_text())
+        except (OSError, ValueError):
+            _forbidden = {}
+    return _forbidden
+
+
+def _is_known_forbidden(slug):
+    entry = _forbidden_slugs().get(slug)
+    return entry is not None and (time.time() - entry['ts']) < _forbidden_ttl_seconds
+
+
+def _remember_forbidden(slug, status):
+    with _forbidden_lock:
+        forbidden = _forbidden_slugs()
+        forbidden[slug] = {'status': status, 'ts': time.time()}
+        cache_path = _forbidden_cache_path()
+        tmp_path = cache_path.with_name(cache_path.name + '.tmp')
+        tmp_path.write_text(json.dumps(forbidden))
+        os.replace(tmp_path, cache_path)  # atomic: readers never see a partial file
+
+
+def _validators_sidecar(filepath):
+    """Where a download's http cache validators live (etag/last-modified;
+    nothing to do with owid's own metadata json)."""
+    return filepath.with_name(filepath.name + '.meta.json')
+
+
+def _load_validators(filepath):
+    try:
+        return json.loads(_validators_sidecar(filepath).read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_validators(filepath, response_headers):
+    validators = {}
+    etag = response_headers.get('ETag')
+    if etag is not None:
+        validators['etag'] = etag
+    last_modified = response_headers.get('Last-Modified')
+    if last_modified is not None:
+        validators['last_modified'] = last_modified
+    if validators:
+        _validators_sidecar(filepath).write_text(json.dumps(validators))
+
+
+async def _download_url_to_file(session, url, filepath, *, chk_size=DFLT_CHK_SIZE):
+    """Stream ``url``'s body to ``filepath`` in ``chk_size`` chunks.
+
+    If we downloaded ``filepath`` before, the GET is conditional
+    (``If-None-Match``/``If-Modified-Since``), so re-checking an unchanged
+    multi-MB csv costs a ~200-byte 304 response instead of a full download.
+    """
+    headers = {}
+    if filepath.exists():
+        validators = _load_validators(filepath)
+        if 'etag' in validators:
+            headers['If-None-Match'] = validators['etag']
+        if 'last_modified' in validators:
+            headers['If-Modified-Since'] = validators['last_modified']
+    async with session.get(url, headers=headers) as resp:
+        if resp.status == 304:  # not modified: our local copy is current
+            return filepath
+        resp.raise_for_status()
+        # Stream to a temp name and os.replace on success, so a connection
+        # drop mid-download can never leave a truncated file at the final
+        # path (which the cache probes would mistake for a complete one).
+        tmp_path = filepath.with_name(filepath.name + '.part')
+        with open(tmp_path, 'wb') as f:
+            async for chunk in resp.content.iter_chunked(chk_size):
+                f.write(chunk)
+        os.replace(tmp_path, filepath)
+        _save_validators(filepath, resp.headers)
+    return filepath
+
+
+def _extract_member(zf, member, dst_path):
+    """Stream one archive member to ``dst_path`` in 1 MiB chunks: peak memory
+    is the buffer, not the member size."""
+    # buffering matches the copy chunk, so flushes are 1 MiB write syscalls
+    # rather than the 8 KiB default
+    with zf.open(member) as fsrc, open(dst_path, 'wb', buffering=1 << 20) as fdst:
+        shutil.copyfileobj(fsrc, fdst, length=1 << 20)
+    return dst_path
+
+
+def _download_from_zip(slug, zip_path):
+    """Extract a slug's csv and metadata json out of a downloaded owid zip,
+    placing them where the flat downloads would have gone."""
+    _, csv_path = slug_to_url_and_filename(slug, kind='csv')
+    _, json_path = slug_to_url_and_filename(slug, kind='json')
+    csv_member = f'{slug}.csv'
+    meta_member = f'{slug}.metadata.json'
+    with zipfile.ZipFile(zip_path) as zf:
+        # The members are independent and zlib releases the GIL while
+        # decompressing, so extracting them in two threads overlaps
+        # decompression with the disk writes.
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            csv_future = executor.submit(_extract_member, zf, csv_member, csv_path)
+            json_future = executor.submit(_extract_member, zf, meta_member, json_path)
+            csv_future.result()
+            json_future.result()
+    return json_path, csv_path
+
+
+async def _acquire_owid_data_async(slug, session, semaphore, refresh=False):
+    """Acquire the ``OwidPaths`` of one slug, downloading json and csv
+    concurrently, falling back to the slug's zip if the flat downloads aren't
+    served (some datasets only come zipped). Slugs the server refuses to serve
+    at all (non-redistributable datasets, say) come back as
+    ``OwidPaths(None, None)``, and are remembered on disk so they're not
+    re-asked for a while."""
+    os.makedirs(owid_downloads_dir_path, exist_ok=True)
+    json_url, json_path = slug_to_url_and_filename(slug, kind='json')
+    csv_url, csv_path = slug_to_url_and_filename(slug, kind='csv')
+    entries = _downloads_dir_entries(refresh=refresh)
+    if (
+        not refresh
+        and _is_downloaded(f'{slug}.metadata.json', entries)
+        and _is_downloaded(f'{slug}.csv', entries)
+    ):
+        return OwidPaths(json_path, csv_path)
+    if not refresh and _is_known_forbidden(slug):
+        return OwidPaths(None, None)
+    forbidden_status = None
+    async with semaphore:
+        results = await asyncio.gather(
+            _download_url_to_file(session, json_url, json_path),
+            _download_url_to_file(session, csv_url, csv_path),
+            return_exceptions=True,  # so a failure doesn't orphan its sibling
+        )
+    errors = [r for r in results if isinstance(r, BaseException)]
+    for error in errors:
+        if not (
+            isinstance(error, aiohttp.ClientResponseError)
+            and error.status in _not_served_statuses
+        ):
+            raise error
+    if errors:
+        zip_url, zip_path = slug_to_url_and_filename(slug, kind='zip')
+        try:
+            async with semaphore:
+                await _download_url_to_file(session, zip_url, zip_path)
+        except aiohttp.ClientResponseError as error:
+            if error.status not in _not_served_statuses:
+                raise
+            forbidden_status = error.status
+        else:
+            json_path, csv_path = _download_from_zip(slug, zip_path)
+    if forbidden_status is not None:
+        _remember_forbidden(slug, forbidden_status)
+        return OwidPaths(None, None)
+    _forget_dir_entries()
+    return OwidPaths(json_path, csv_path)
+
+
+async def _acquire_many_owid_async(slugs, refresh=False):
+    if aiohttp is None:
+        raise ModuleNotFoundError(
+            'You need aiohttp to download owid data: pip install aiohttp'
+        )
+    semaphore = asyncio.Semaphore(_max_concurrent_downloads)
+    connector = aiohttp.TCPConnector(limit=32, limit_per_host=8)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        return await asyncio.gather(
+            *(
+                _acquire_owid_data_async(slug, session, semaphore, refresh)
+                for slug in slugs
+            )
+        )
+
+
+def acquire_owid_data(slug, refresh=False):
+    """Get the ``OwidPaths`` of a slug's (locally downloaded) data.
+
+    >>> paths = acquire_owid_data('life-expectancy')  # doctest: +SKIP
+    >>> paths.csv  # doctest: +SKIP
+    PosixPath('.../life-expectancy.csv')
+    """
+    return asyncio.run(_acquire_many_owid_async([slug], refresh=refresh))[0]
+
+
+def acquire_many_owid(slugs, refresh=False):
+    """Get a list of ``OwidPaths``, one per slug, downloading them all
+    concurrently."""
+    return asyncio.run(_acquire_many_owid_async(list(slugs), refresh=refresh))